@@ -0,0 +1,34 @@
+"""
+Reset per-process state in a forked child.
+
+Locks, worker threads and database handles do not survive fork, so objects that own them
+register here and are reset by a single os.register_at_fork hook. Fork callbacks can never
+be unregistered, so targets are held weakly: a discarded backend, cache or scheduler is
+still freed.
+"""
+
+
+from typing import Any
+import os
+import weakref
+
+
+_targets = weakref.WeakSet()
+
+
+def register(target: Any) -> Any:
+    """
+    Reset target in every forked child: an object's _after_fork() method is called, a
+    function is called directly. Returns target, so it can decorate a function.
+    """
+    _targets.add(target)
+    return target
+
+
+def _run_after_fork():
+    for target in list(_targets):
+        reset = getattr(target, "_after_fork", target)
+        reset()
+
+
+os.register_at_fork(after_in_child=_run_after_fork)
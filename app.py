@@ -1,10 +1,31 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
 import asyncio
+import io
+import json
+import os
+import tempfile
 import time
-from semantic_chunk import process_text
+from semantic_chunk import process_text, scheduler, cache, preload_weights, start_warm_up, readiness, validate_breakpoint_args
+from stream_chunk import iter_chunks
+from document_session import SessionStore, SessionConflict, SessionTooLarge
+from profiling import PipelineStats, StageMetrics
 
 app = Flask(__name__)
 
+sessions = SessionStore(
+    path=os.environ.get("SESSIONS_PATH") or None,
+    max_sessions=int(os.environ.get("MAX_SESSIONS", 1000)),
+    max_bytes=int(os.environ.get("SESSIONS_MAX_BYTES", 512 * 1024 * 1024)),
+)
+pipeline_metrics = StageMetrics()
+
+# Under gunicorn.conf.py the master only loads the weights, so forked workers share them,
+# and every worker warms up after the fork. Otherwise warm up in the background right away.
+if os.environ.get("CHUNKER_WARMUP") == "post_fork":
+    preload_weights()
+else:
+    start_warm_up()
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -18,16 +39,37 @@ def process():
         if not input_text.strip():
             return jsonify({"error": "Input text cannot be empty"}), 400
 
+        # Optional breakpoint strategy and chunk size budget
+        breakpoint_type = request.form.get('breakpoint_type') or 'percentile'
+        try:
+            breakpoint_amount = _optional_number(request.form.get('breakpoint_amount'), float)
+            max_chunk_tokens = _optional_number(request.form.get('max_chunk_tokens'), int)
+        except ValueError:
+            return jsonify({"error": "breakpoint_amount and max_chunk_tokens must be numbers"}), 400
+        try:
+            validate_breakpoint_args(breakpoint_type, breakpoint_amount, max_chunk_tokens)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
         # Run the chunking asynchronously
         start_time = time.time()
-        chunks = asyncio.run(process_text(input_text))
+        stats = PipelineStats()
+        chunks = asyncio.run(process_text(
+            input_text,
+            breakpoint_type=breakpoint_type,
+            breakpoint_amount=breakpoint_amount,
+            max_chunk_tokens=max_chunk_tokens,
+            stats=stats,
+        ))
         end_time = time.time()
 
         runtime = end_time - start_time
+        pipeline_metrics.record(stats)
 
         # Prepare the response data
         response = {
             "runtime": runtime,
+            "profile": stats.as_dict(),
             "chunks": [{"id": i, "text": chunk} for i, chunk in enumerate(chunks)]
         }
 
@@ -35,5 +77,96 @@ def process():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _optional_number(value, kind):
+    if value is None or not value.strip():
+        return None
+    return kind(value)
+
+@app.route('/process/stream', methods=['POST'])
+def process_stream():
+    # Accepts either a 'file' upload or the 'text' form field and answers with
+    # newline-delimited JSON: one {"id", "text"} line per chunk, then a summary line.
+    upload = request.files.get('file')
+    upload_path = None
+    if upload is not None:
+        # the upload is closed once this view returns, before the response is streamed,
+        # so it is spooled to a file that the generator reads and removes
+        fd, upload_path = tempfile.mkstemp(suffix='.txt')
+        os.close(fd)
+        upload.save(upload_path)
+        source = upload_path
+    else:
+        input_text = request.form.get('text') or ''
+        if not input_text.strip():
+            return jsonify({"error": "Input text cannot be empty"}), 400
+        source = io.StringIO(input_text)
+
+    def generate():
+        start_time = time.time()
+        count = 0
+        try:
+            for i, chunk in enumerate(iter_chunks(source)):
+                count += 1
+                yield json.dumps({"id": i, "text": chunk}) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+            return
+        finally:
+            if upload_path is not None:
+                os.remove(upload_path)
+        yield json.dumps({"runtime": time.time() - start_time, "chunks": count}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/sessions', methods=['POST'])
+def create_session():
+    session_id, session = sessions.create()
+    return _update_session(session_id, session, request.form.get('text') or '')
+
+@app.route('/sessions/<session_id>', methods=['POST'])
+def update_session(session_id):
+    session = sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": "Unknown session"}), 404
+    return _update_session(session_id, session, request.form.get('text') or '')
+
+@app.route('/sessions/<session_id>', methods=['DELETE'])
+def delete_session(session_id):
+    if not sessions.delete(session_id):
+        return jsonify({"error": "Unknown session"}), 404
+    return jsonify({"deleted": session_id})
+
+def _update_session(session_id, session, input_text):
+    # The new version is only saved if no other request saved one in the meantime,
+    # so concurrent edits of one document never silently overwrite each other
+    rethreshold = request.form.get('rethreshold', '').lower() in ('1', 'true', 'yes')
+    start_time = time.time()
+    result = asyncio.run(session.update(input_text, rethreshold=rethreshold))
+    try:
+        sessions.save(session_id, session)
+    except SessionConflict:
+        return jsonify({"error": "The session was updated by another request, resubmit the text"}), 409
+    except SessionTooLarge:
+        return jsonify({"error": "Document is too large to keep as a session"}), 413
+    except KeyError:
+        return jsonify({"error": "Unknown session"}), 404
+    result["session_id"] = session_id
+    result["runtime"] = time.time() - start_time
+    return jsonify(result)
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    status = readiness()
+    return jsonify(status), (200 if status["ready"] else 503)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return jsonify({
+        "scheduler": scheduler.metrics(),
+        "cache": cache.stats(),
+        "sessions": sessions.stats(),
+        "pipeline": pipeline_metrics.snapshot(),
+    })
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,229 @@
+"""
+Offline batch chunker for a corpus of documents.
+
+Reads a directory of .txt files or a JSONL file and writes one chunk file per document in
+the same "Chunk Index,Chunk Content" layout as the CSVs under dataset/ (or JSONL), named
+like them: <stem>.txt is chunked into <stem>.csv.
+Sentence splitting and embedding run in separate process pools so the next documents are
+split while earlier ones are embedded; every embedding worker loads the model once.
+Finished documents are recorded in a checkpoint file so an interrupted run can resume.
+
+    python batch_chunk.py dataset/ out/
+    python batch_chunk.py requests.jsonl out/ --id-field request_id --text-field body --format jsonl
+"""
+
+
+from typing import Dict, Iterator, List, Optional, Tuple
+import argparse
+import asyncio
+import concurrent.futures
+import csv
+import json
+import os
+import re
+import sys
+import time
+
+
+CHECKPOINT_NAME = ".checkpoint"
+
+
+def iter_documents(path: str, id_field: str = "id", text_field: str = "text") -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Yield (doc_id, text, file_path) for every document under path. Directory entries are
+    read lazily by the split workers, so text is None and file_path is set for them.
+    """
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith(".txt"):
+                yield os.path.splitext(name)[0], None, os.path.join(path, name)
+        return
+
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            doc_id = str(record.get(id_field, line_no))
+            yield doc_id, record[text_field], None
+
+
+def output_path(out_dir: str, doc_id: str, fmt: str) -> str:
+    safe_id = re.sub(r"[^A-Za-z0-9._-]+", "_", doc_id)
+    return os.path.join(out_dir, f"{safe_id}.{fmt}")
+
+
+def write_chunks(path: str, chunks: List[str], fmt: str):
+    # write to a temporary file first so a killed run never leaves a half-written output
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(["Chunk Index", "Chunk Content"])
+            writer.writerows((i, chunk) for i, chunk in enumerate(chunks, 1))
+        else:
+            for i, chunk in enumerate(chunks, 1):
+                f.write(json.dumps({"chunk_index": i, "chunk_content": chunk}) + "\n")
+    os.replace(tmp, path)
+
+
+def load_checkpoint(out_dir: str) -> set:
+    path = os.path.join(out_dir, CHECKPOINT_NAME)
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def _split_document(doc_id: str, text: Optional[str], file_path: Optional[str]) -> Tuple[str, List[str], float]:
+    from semantic_chunk import chunk_by_sentece
+
+    start = time.perf_counter()
+    if text is None:
+        with open(file_path, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+    sentences = chunk_by_sentece(text)
+    return doc_id, sentences, time.perf_counter() - start
+
+
+def _init_embed_worker(threads: int):
+    # Split the cores between the workers instead of letting every worker's torch or ONNX
+    # Runtime start one thread per core. EMBED_THREADS is read when semantic_chunk builds
+    # its backend, so it has to be set before the import; an explicit setting wins.
+    os.environ.setdefault("EMBED_THREADS", str(threads))
+    # load the model once for the lifetime of the worker
+    from semantic_chunk import warm_up
+    warm_up()
+
+
+def _chunk_document(doc_id: str, sentences: List[str]) -> Tuple[str, List[str], Dict[str, float]]:
+    from semantic_chunk import chunk_sentences
+    from profiling import PipelineStats
+
+    if len(sentences) < 2:
+        # there is no distance to threshold; the document is its own chunk
+        return doc_id, sentences, {}
+    stats = PipelineStats()
+    chunks = asyncio.run(chunk_sentences(sentences, stats))
+    return doc_id, chunks, stats.stages
+
+
+def run(args) -> Dict[str, float]:
+    os.makedirs(args.output, exist_ok=True)
+    done = load_checkpoint(args.output) if args.resume else set()
+    checkpoint = open(os.path.join(args.output, CHECKPOINT_NAME), "a" if args.resume else "w", encoding="utf-8")
+
+    stages = {"split": 0.0, "write": 0.0}
+    docs = 0
+    sentences_total = 0
+    skipped = 0
+    failed = 0
+    start = time.perf_counter()
+
+    documents = iter_documents(args.input, args.id_field, args.text_field)
+    max_in_flight = 2 * args.workers
+    threads_per_worker = max(1, (os.cpu_count() or 1) // args.workers)
+
+    with concurrent.futures.ProcessPoolExecutor(args.split_workers) as split_pool, \
+            concurrent.futures.ProcessPoolExecutor(
+                args.workers, initializer=_init_embed_worker, initargs=(threads_per_worker,)
+            ) as embed_pool:
+        splitting = set()
+        embedding = set()
+        exhausted = False
+
+        while True:
+            # keep both pools fed without reading the whole corpus into memory
+            while not exhausted and len(splitting) + len(embedding) < max_in_flight:
+                doc = next(documents, None)
+                if doc is None:
+                    exhausted = True
+                    break
+                if doc[0] in done:
+                    skipped += 1
+                    continue
+                splitting.add(split_pool.submit(_split_document, *doc))
+
+            if not splitting and not embedding:
+                break
+
+            finished, _ = concurrent.futures.wait(splitting | embedding, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                if future in splitting:
+                    splitting.discard(future)
+                    try:
+                        doc_id, sentences, seconds = future.result()
+                    except Exception as e:
+                        print("splitting failed", e)
+                        failed += 1
+                        continue
+                    stages["split"] += seconds
+                    sentences_total += len(sentences)
+                    embedding.add(embed_pool.submit(_chunk_document, doc_id, sentences))
+                    continue
+
+                embedding.discard(future)
+                try:
+                    doc_id, chunks, timings = future.result()
+                except Exception as e:
+                    print("chunking failed", e)
+                    failed += 1
+                    continue
+                for stage, seconds in timings.items():
+                    stages[stage] = stages.get(stage, 0.0) + seconds
+
+                t = time.perf_counter()
+                write_chunks(output_path(args.output, doc_id, args.format), chunks, args.format)
+                checkpoint.write(doc_id + "\n")
+                checkpoint.flush()
+                os.fsync(checkpoint.fileno())
+                stages["write"] += time.perf_counter() - t
+                docs += 1
+
+    checkpoint.close()
+    elapsed = time.perf_counter() - start
+    return {
+        "documents": docs,
+        "skipped": skipped,
+        "failed": failed,
+        "sentences": sentences_total,
+        "seconds": elapsed,
+        "documents_per_second": docs / elapsed if elapsed else 0.0,
+        "sentences_per_second": sentences_total / elapsed if elapsed else 0.0,
+        "stage_seconds": stages,
+    }
+
+
+def print_summary(summary: Dict[str, float]):
+    print(f"documents: {summary['documents']} ({summary['skipped']} already done, {summary['failed']} failed)")
+    print(f"sentences: {summary['sentences']}")
+    print(f"wall time: {summary['seconds']:.2f}s")
+    print(f"throughput: {summary['documents_per_second']:.2f} docs/s, {summary['sentences_per_second']:.1f} sentences/s")
+    print("stage time (summed over workers):")
+    for stage, seconds in summary["stage_seconds"].items():
+        print(f"  {stage:<10} {seconds:.2f}s")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Semantic-chunk a corpus of documents.")
+    parser.add_argument("input", help="directory of .txt files or a JSONL file")
+    parser.add_argument("output", help="directory for the per-document chunk files")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="embedding processes")
+    parser.add_argument("--split-workers", type=int, default=1, help="sentence splitting processes")
+    parser.add_argument("--id-field", default="id", help="JSONL field holding the document id")
+    parser.add_argument("--text-field", default="text", help="JSONL field holding the document text")
+    parser.add_argument("--no-resume", dest="resume", action="store_false", help="ignore and overwrite the checkpoint")
+    parser.add_argument("--json-summary", action="store_true", help="print the summary as JSON")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    summary = run(args)
+    if args.json_summary:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+    # let scripted runs notice documents that could not be chunked
+    sys.exit(1 if summary["failed"] else 0)
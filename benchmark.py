@@ -0,0 +1,230 @@
+"""
+Reproducible benchmark of the chunking pipeline.
+
+Runs process_text over the dataset/ corpora and over synthetic documents of the requested
+sizes, and reports per-stage latency percentiles, throughput and peak memory. Results can
+be saved as JSON and compared with an earlier run to catch regressions.
+
+    python benchmark.py --output base.json
+    python benchmark.py --sizes 1KB,1MB,100MB --backend hashing --output new.json --compare base.json
+"""
+
+
+from typing import Any, Dict, Iterator, List, Tuple
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+
+SIZE_UNITS = {"KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+
+_TOPICS = [
+    "court judge verdict law trial justice appeal witness jury evidence statute ruling".split(),
+    "otter kelp ocean reef tide current urchin shell coast marine predator habitat".split(),
+    "theatre actor comedy stage audience role script director premiere applause film".split(),
+    "moon orbit ice crust probe planet telescope gravity spacecraft crater signal".split(),
+    "fossil wing jurassic feather species evolution skeleton sediment dinosaur era".split(),
+]
+_FILLER = "the a of and in to with as by for that its their this".split()
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().upper()
+    for unit, factor in SIZE_UNITS.items():
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * factor)
+    return int(text)
+
+
+def synthetic_document(size: int, seed: int = 0) -> str:
+    """A deterministic document of about size bytes whose topic changes every few sentences."""
+    rng = random.Random(seed)
+    sentences = []
+    length = 0
+    topic = rng.choice(_TOPICS)
+    while length < size:
+        if rng.random() < 0.15:
+            topic = rng.choice(_TOPICS)
+        words = [rng.choice(topic) if rng.random() < 0.6 else rng.choice(_FILLER) for _ in range(rng.randint(8, 30))]
+        sentence = " ".join(words).capitalize() + "."
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(sentences)
+
+
+def corpora(dataset_dir: str, sizes: List[str]) -> Iterator[Tuple[str, List[str]]]:
+    files = sorted(glob.glob(os.path.join(dataset_dir, "*.txt")))
+    if files:
+        docs = []
+        for path in files:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                docs.append(f.read())
+        yield "dataset", docs
+    for size in sizes:
+        yield f"synthetic-{size}", [synthetic_document(parse_size(size))]
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    import numpy as np
+
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50_ms": 1000.0 * p50, "p95_ms": 1000.0 * p95, "p99_ms": 1000.0 * p99, "mean_ms": 1000.0 * float(np.mean(values))}
+
+
+def run_corpus(docs: List[str], repeat: int, trace_memory: bool) -> Dict[str, Any]:
+    from semantic_chunk import process_text
+    from profiling import PipelineStats, peak_rss_bytes
+
+    stage_samples = {}
+    counters = {}
+    failures = 0
+    total_bytes = 0
+    total_sentences = 0
+    wall = 0.0
+    traced_peak = 0
+
+    for _ in range(repeat):
+        for doc in docs:
+            stats = PipelineStats()
+            if trace_memory:
+                tracemalloc.start()
+            start = time.perf_counter()
+            asyncio.run(process_text(doc, stats=stats))
+            elapsed = time.perf_counter() - start
+            if trace_memory:
+                traced_peak = max(traced_peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+
+            # process_text returns no chunks instead of raising; a failed document is not
+            # a fast run and must stay out of the latency samples
+            if not stats.counters.get("chunks"):
+                failures += 1
+                continue
+
+            wall += elapsed
+            stage_samples.setdefault("total", []).append(stats.total)
+            for name, seconds in stats.stages.items():
+                stage_samples.setdefault(name, []).append(seconds)
+            for name, n in stats.counters.items():
+                counters[name] = counters.get(name, 0) + n
+            total_bytes += len(doc.encode("utf-8"))
+            total_sentences += stats.counters.get("sentences", 0)
+
+    return {
+        "documents": len(docs) * repeat,
+        "failures": failures,
+        "bytes": total_bytes,
+        "seconds": wall,
+        "mb_per_second": total_bytes / (1024 ** 2) / wall if wall else 0.0,
+        "sentences_per_second": total_sentences / wall if wall else 0.0,
+        "stages": {name: percentiles(samples) for name, samples in stage_samples.items()},
+        "counters": counters,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "peak_traced_bytes": traced_peak if trace_memory else None,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> List[str]:
+    """Print the p50 and throughput change per corpus and stage; return the regressions."""
+    regressions = []
+    for corpus, result in current["corpora"].items():
+        base = baseline["corpora"].get(corpus)
+        if base is None:
+            continue
+        print(f"\n{corpus}")
+        for stage, numbers in result["stages"].items():
+            old = base["stages"].get(stage, {}).get("p50_ms")
+            if not old:
+                continue
+            change = numbers["p50_ms"] / old - 1
+            flag = ""
+            if change > tolerance:
+                flag = "  REGRESSION"
+                regressions.append(f"{corpus}/{stage} p50 {change:+.1%}")
+            print(f"  {stage:<12} p50 {old:10.2f} -> {numbers['p50_ms']:10.2f} ms ({change:+.1%}){flag}")
+        if base["sentences_per_second"]:
+            change = result["sentences_per_second"] / base["sentences_per_second"] - 1
+            flag = ""
+            if change < -tolerance:
+                flag = "  REGRESSION"
+                regressions.append(f"{corpus} throughput {change:+.1%}")
+            print(f"  {'throughput':<12} {base['sentences_per_second']:10.1f} -> {result['sentences_per_second']:10.1f} sentences/s ({change:+.1%}){flag}")
+    return regressions
+
+
+def print_report(results: Dict[str, Any]):
+    for corpus, result in results["corpora"].items():
+        print(f"\n{corpus}: {result['documents']} docs, {result['bytes'] / 1024:.0f} KB, "
+              f"{result['mb_per_second']:.3f} MB/s, {result['sentences_per_second']:.1f} sentences/s")
+        if result["failures"]:
+            print(f"  FAILED     {result['failures']} of {result['documents']} runs produced no chunks")
+        for stage, numbers in result["stages"].items():
+            print(f"  {stage:<12} p50 {numbers['p50_ms']:10.2f}  p95 {numbers['p95_ms']:10.2f}  p99 {numbers['p99_ms']:10.2f} ms")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the semantic chunking pipeline.")
+    parser.add_argument("--dataset", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataset"))
+    parser.add_argument("--sizes", default="1KB,10KB,100KB,1MB", help="comma-separated synthetic document sizes, up to e.g. 100MB")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--backend", default=None, help="embedding backend (see embedding_backends.py)")
+    parser.add_argument("--cache", action="store_true", help="keep the embedding cache on; by default every repeat re-encodes")
+    parser.add_argument("--trace-memory", action="store_true", help="measure peak Python heap with tracemalloc (slower)")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative slowdown before flagging a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    # configure the pipeline before semantic_chunk builds its backend and cache
+    if args.backend:
+        os.environ["EMBED_BACKEND"] = args.backend
+    if not args.cache:
+        os.environ["EMBED_CACHE_MAX_BYTES"] = "0"
+        os.environ.pop("EMBED_CACHE_PATH", None)
+
+    from semantic_chunk import backend, warm_up
+
+    warm_up()
+    sizes = [s for s in args.sizes.split(",") if s.strip()]
+    results = {
+        "backend": backend.name,
+        "repeat": args.repeat,
+        "python": sys.version.split()[0],
+        "corpora": {},
+    }
+    for name, docs in corpora(args.dataset, sizes):
+        results["corpora"][name] = run_corpus(docs, args.repeat, args.trace_memory)
+
+    print_report(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    status = 0
+    failed = [name for name, result in results["corpora"].items() if result["failures"]]
+    if failed:
+        # a benchmark that skipped documents does not measure the whole corpus
+        print("\nfailed documents in: " + ", ".join(failed))
+        status = 1
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.tolerance)
+        if regressions:
+            print("\nregressions:\n  " + "\n  ".join(regressions))
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+import os
+
+# the tests run on the deterministic hashing backend, so they need no model download
+os.environ["EMBED_BACKEND"] = "hashing"
+os.environ.pop("EMBED_CACHE_PATH", None)
@@ -0,0 +1,309 @@
+"""
+Incremental re-chunking of documents that are re-submitted with small edits.
+
+A DocumentSession keeps the sentences, window embeddings, distances, threshold and
+breakpoints of the last version it saw. A new version is diffed against it sentence by
+sentence; windows whose text is unchanged keep their embedding, distances between two
+kept windows are reused, and only breakpoints next to an edit are re-evaluated against
+the stored threshold. The result includes a delta of added, removed and unchanged chunks
+(keyed by content hash) so a downstream vector index only re-indexes what changed.
+
+Sessions are stored in SQLite by a SessionStore, so every worker process of the app can
+continue any session.
+"""
+
+
+from typing import Any, Dict, List, Optional, Tuple
+from collections import Counter
+import difflib
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+import numpy as np
+import after_fork
+from semantic_chunk import (
+    chunk_by_sentece,
+    combine_sentences,
+    get_embeddings,
+    normalize_embeddings,
+    calculate_threshold,
+    create_final_chunks,
+)
+
+
+def chunk_id(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+class SessionConflict(Exception):
+    """Another request saved a newer version of the session first."""
+
+
+class SessionTooLarge(Exception):
+    """The session alone is larger than the store's byte budget."""
+
+
+class DocumentSession:
+    """
+    rethreshold_ratio: when more than this fraction of the distances changed, the percentile
+    threshold is recomputed and every boundary is re-evaluated, since the stored threshold
+    no longer describes the document.
+    """
+
+    def __init__(self, buffer_size: int = 1, percentile: float = 70, rethreshold_ratio: float = 0.5):
+        self.buffer_size = buffer_size
+        self.percentile = percentile
+        self.rethreshold_ratio = rethreshold_ratio
+
+        self.version = 0
+        self.sentences = []
+        self.windows = []
+        self.embeddings = None
+        self.distances = np.zeros(0, dtype=np.float32)
+        self.threshold = None
+        self.breakpoints = []
+        self.chunks = []
+
+    async def update(self, text: str, rethreshold: bool = False) -> Dict[str, Any]:
+        """Submit the next version of the document; returns its chunks and the delta to the previous one."""
+        sentences = chunk_by_sentece(text)
+        windows = combine_sentences(sentences, self.buffer_size)
+        n = len(sentences)
+
+        # map every new sentence that survived the edit to its old position
+        old_index = np.full(n, -1, dtype=np.int64)
+        matcher = difflib.SequenceMatcher(None, self.sentences, sentences, autojunk=False)
+        for block in matcher.get_matching_blocks():
+            old_index[block.b:block.b + block.size] = np.arange(block.a, block.a + block.size)
+
+        reused = np.zeros(n, dtype=bool)
+        for i in np.flatnonzero(old_index >= 0):
+            reused[i] = self.windows[old_index[i]] == windows[i]
+
+        embeddings = None
+        if n:
+            fresh = np.flatnonzero(~reused)
+            new_rows = await get_embeddings([windows[i] for i in fresh]) if len(fresh) else None
+            dim = new_rows.shape[1] if new_rows is not None else self.embeddings.shape[1]
+            embeddings = np.empty((n, dim), dtype=np.float32)
+            if reused.any():
+                embeddings[reused] = self.embeddings[old_index[reused]]
+            if new_rows is not None:
+                embeddings[fresh] = new_rows
+
+        # a distance can be reused when both windows were kept and were neighbours before
+        pair_kept = reused[:-1] & reused[1:] & (old_index[1:] == old_index[:-1] + 1) if n > 1 else np.zeros(0, dtype=bool)
+        distances = np.empty(max(n - 1, 0), dtype=np.float32)
+        if pair_kept.any():
+            distances[pair_kept] = self.distances[old_index[:-1][pair_kept]]
+        changed = np.flatnonzero(~pair_kept)
+        if len(changed):
+            a = normalize_embeddings(embeddings[changed])
+            b = normalize_embeddings(embeddings[changed + 1])
+            distances[changed] = 1 - np.einsum('ij,ij->i', a, b)
+
+        full = (
+            rethreshold
+            or self.threshold is None
+            or (len(distances) and len(changed) / len(distances) > self.rethreshold_ratio)
+        )
+        if len(distances) == 0:
+            threshold = None
+            breakpoints = []
+        elif full:
+            threshold = calculate_threshold(distances, "percentile", percentile=self.percentile)
+            breakpoints = np.flatnonzero(distances > threshold).tolist()
+        else:
+            threshold = self.threshold
+            old_breaks = np.zeros(len(self.distances), dtype=bool)
+            old_breaks[self.breakpoints] = True
+            is_break = np.zeros(len(distances), dtype=bool)
+            is_break[pair_kept] = old_breaks[old_index[:-1][pair_kept]]
+            is_break[changed] = distances[changed] > threshold
+            breakpoints = np.flatnonzero(is_break).tolist()
+
+        chunks = create_final_chunks(sentences, breakpoints) if n else []
+        delta = self._delta(self.chunks, chunks)
+
+        self.version += 1
+        self.sentences = sentences
+        self.windows = windows
+        self.embeddings = embeddings
+        self.distances = distances
+        self.threshold = threshold
+        self.breakpoints = breakpoints
+        self.chunks = chunks
+
+        return {
+            "version": self.version,
+            "chunks": [{"id": chunk_id(c), "text": c} for c in chunks],
+            "delta": delta,
+            "stats": {
+                "sentences": n,
+                "reembedded_windows": int(n - reused.sum()),
+                "recomputed_distances": int(len(changed)),
+                "reevaluated_boundaries": int(len(distances) if full else len(changed)),
+                "rethresholded": bool(full and len(distances)),
+            },
+        }
+
+    def to_state(self) -> Tuple[str, bytes, bytes]:
+        """
+        Serialize the stored version: JSON for the text and parameters, raw float32 for
+        the embeddings and distances. Windows and chunks are rebuilt from the sentences.
+        """
+        state = json.dumps({
+            "buffer_size": self.buffer_size,
+            "percentile": self.percentile,
+            "rethreshold_ratio": self.rethreshold_ratio,
+            "version": self.version,
+            "sentences": self.sentences,
+            "threshold": None if self.threshold is None else float(self.threshold),
+            "breakpoints": [int(b) for b in self.breakpoints],
+            "dim": 0 if self.embeddings is None else int(self.embeddings.shape[1]),
+        })
+        embeddings = b"" if self.embeddings is None else self.embeddings.astype(np.float32).tobytes()
+        return state, embeddings, self.distances.astype(np.float32).tobytes()
+
+    @classmethod
+    def from_state(cls, state: str, embeddings: bytes, distances: bytes) -> "DocumentSession":
+        data = json.loads(state)
+        session = cls(data["buffer_size"], data["percentile"], data["rethreshold_ratio"])
+        session.version = data["version"]
+        session.sentences = data["sentences"]
+        session.windows = combine_sentences(session.sentences, session.buffer_size)
+        if data["dim"]:
+            session.embeddings = np.frombuffer(embeddings, dtype=np.float32).reshape(-1, data["dim"])
+        session.distances = np.frombuffer(distances, dtype=np.float32)
+        session.threshold = data["threshold"]
+        session.breakpoints = data["breakpoints"]
+        session.chunks = create_final_chunks(session.sentences, session.breakpoints) if session.sentences else []
+        return session
+
+    @staticmethod
+    def _delta(old: List[str], new: List[str]) -> Dict[str, List]:
+        remaining = Counter(chunk_id(c) for c in old)
+        added, unchanged = [], []
+        for i, c in enumerate(new):
+            cid = chunk_id(c)
+            if remaining[cid] > 0:
+                remaining[cid] -= 1
+                unchanged.append(cid)
+            else:
+                added.append({"index": i, "id": cid, "text": c})
+        removed = [cid for cid, count in remaining.items() for _ in range(count)]
+        return {"added": added, "removed": removed, "unchanged": unchanged}
+
+
+class SessionStore:
+    """
+    Sessions kept in SQLite, so that every worker process sharing path sees the same ones;
+    without a path they live in an in-memory database private to this process. The least
+    recently used sessions are dropped once there are more than max_sessions or together
+    they take more than max_bytes.
+
+    Saving is optimistic: a session loaded with get() is only written back if no other
+    request saved a newer version in the meantime, otherwise save() raises SessionConflict.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_sessions: int = 1000, max_bytes: int = 512 * 1024 * 1024):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = None
+        after_fork.register(self)
+
+    def _after_fork(self):
+        # SQLite connections must not be shared across fork; the child opens its own
+        self._lock = threading.Lock()
+        self._db = None
+
+    def create(self, **kwargs) -> Tuple[str, DocumentSession]:
+        """A new session and its id; it is stored by the first save()."""
+        return uuid.uuid4().hex, DocumentSession(**kwargs)
+
+    def get(self, session_id: str) -> Optional[DocumentSession]:
+        with self._lock:
+            db = self._connect()
+            with db:
+                db.execute("UPDATE sessions SET used = ? WHERE id = ?", (time.time(), session_id))
+                row = db.execute(
+                    "SELECT state, embeddings, distances FROM sessions WHERE id = ?", (session_id,)
+                ).fetchone()
+        return DocumentSession.from_state(*row) if row else None
+
+    def save(self, session_id: str, session: DocumentSession):
+        """
+        Store the version session was just updated to. Raises SessionConflict when another
+        version was saved first, KeyError when the session was deleted or evicted and
+        SessionTooLarge when it alone exceeds max_bytes (it is then dropped).
+        """
+        state, embeddings, distances = session.to_state()
+        size = len(state) + len(embeddings) + len(distances)
+        row = (session.version, state, embeddings, distances, size, time.time(), session_id)
+        with self._lock:
+            db = self._connect()
+            if size > self.max_bytes:
+                with db:
+                    db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+                raise SessionTooLarge(session_id)
+            with db:
+                if session.version == 1:
+                    try:
+                        db.execute(
+                            "INSERT INTO sessions (version, state, embeddings, distances, bytes, used, id) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            row,
+                        )
+                    except sqlite3.IntegrityError:
+                        raise SessionConflict(session_id)
+                else:
+                    updated = db.execute(
+                        "UPDATE sessions SET version = ?, state = ?, embeddings = ?, distances = ?, bytes = ?, used = ? "
+                        "WHERE id = ? AND version = ?",
+                        row + (session.version - 1,),
+                    ).rowcount
+                    if not updated:
+                        exists = db.execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone()
+                        raise SessionConflict(session_id) if exists else KeyError(session_id)
+                self._evict(db)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            db = self._connect()
+            with db:
+                return db.execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount > 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            count, size = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM sessions").fetchone()
+        return {"sessions": count, "bytes": size, "max_sessions": self.max_sessions, "max_bytes": self.max_bytes, "path": self.path}
+
+    def _evict(self, db: sqlite3.Connection):
+        db.execute(
+            "DELETE FROM sessions WHERE id IN (SELECT id FROM sessions ORDER BY used DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,),
+        )
+        # keep the most recently used sessions whose sizes add up to at most max_bytes
+        db.execute(
+            "DELETE FROM sessions WHERE id IN ("
+            "SELECT id FROM (SELECT id, SUM(bytes) OVER (ORDER BY used DESC, id) AS total FROM sessions) "
+            "WHERE total > ?)",
+            (self.max_bytes,),
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path or ":memory:", timeout=30, check_same_thread=False)
+            if self.path:
+                self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "id TEXT PRIMARY KEY, version INTEGER, state TEXT, embeddings BLOB, distances BLOB, "
+                "bytes INTEGER, used REAL)"
+            )
+        return self._db
@@ -0,0 +1,308 @@
+"""
+Embedding backends that get_embeddings dispatches through.
+
+- "sentence-transformers": the reference all-MiniLM-L6-v2 model on PyTorch
+- "onnx": the same model exported to ONNX and run with ONNX Runtime, without torch
+- "onnx-int8": the ONNX model with dynamically int8-quantized weights, the CPU fast path
+- "hashing": a deterministic hashed bag-of-words embedding for tests and benchmarks
+
+The backend is picked with EMBED_BACKEND, the model with EMBED_MODEL and the inference
+thread count with EMBED_THREADS. Backends are compared by how well their chunk boundaries
+agree with the reference model:
+
+    python embedding_backends.py dataset/*.txt --candidates onnx-int8 hashing
+"""
+
+
+from typing import Dict, List, Optional, Sequence
+import argparse
+import json
+import os
+import re
+import threading
+import zlib
+import numpy as np
+import after_fork
+
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+
+class EmbeddingBackend:
+    """
+    Turns a list of texts into a (len(texts), dim) float32 array.
+
+    Constructing a backend is cheap: weights and heavy libraries are loaded by load(), which
+    runs once per process, is thread-safe and is called implicitly by the first encode().
+    """
+
+    # identifies the embedding space; used to key the embedding cache
+    name = "base"
+
+    def __init__(self):
+        self._load_lock = threading.Lock()
+        self.loaded = False
+        after_fork.register(self)
+
+    def load(self):
+        if self.loaded:
+            return
+        with self._load_lock:
+            if not self.loaded:
+                self._load()
+                self.loaded = True
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        self.load()
+        return self._encode(texts, batch_size)
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Length of text in the model's tokens, without special tokens. Backends without a
+        subword tokenizer count whitespace-separated words.
+        """
+        self.load()
+        return self._count_tokens(text)
+
+    @property
+    def dimension(self) -> int:
+        """Width of the embeddings; loads the backend if needed."""
+        self.load()
+        return self._dimension()
+
+    def _load(self):
+        pass
+
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        raise NotImplementedError
+
+    def _dimension(self) -> int:
+        return self._encode([""], 1).shape[1]
+
+    def _count_tokens(self, text: str) -> int:
+        return len(text.split())
+
+    def _after_fork(self):
+        # the lock may have been held by another thread at fork time; loaded weights are
+        # kept and shared copy-on-write with the parent
+        self._load_lock = threading.Lock()
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    def __init__(self, model_name: str = DEFAULT_MODEL, threads: Optional[int] = None):
+        super().__init__()
+        self.model_name = model_name
+        self.name = model_name
+        self.threads = threads
+        self.model = None
+
+    def _load(self):
+        from sentence_transformers import SentenceTransformer
+
+        if self.threads:
+            import torch
+            torch.set_num_threads(self.threads)
+        self.model = SentenceTransformer(self.model_name)
+
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        return self.model.encode(texts, convert_to_numpy=True, batch_size=batch_size)
+
+    def _dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def _count_tokens(self, text: str) -> int:
+        return len(self.model.tokenizer.tokenize(text))
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    Runs the transformer with ONNX Runtime and reproduces the sentence-transformers
+    pooling (attention-masked mean, then L2 normalization). The exported graph and
+    tokenizer are fetched from the model's hub repository; with quantize=True the weights
+    are converted to int8 once and the quantized graph is kept next to the original.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, quantize: bool = False, threads: Optional[int] = None, max_length: int = 256):
+        super().__init__()
+        self.model_name = model_name
+        self.name = model_name + ("-onnx-int8" if quantize else "-onnx")
+        self.quantize = quantize
+        self.threads = threads
+        self.max_length = max_length
+        self.session = None
+        self.tokenizer = None
+        self.counter = None
+
+    def _load(self):
+        import onnxruntime as ort
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        model_path = hf_hub_download(self.model_name, "onnx/model.onnx")
+        if self.quantize:
+            model_path = self._quantize(model_path)
+
+        options = ort.SessionOptions()
+        if self.threads:
+            options.intra_op_num_threads = self.threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        tokenizer_path = hf_hub_download(self.model_name, "tokenizer.json")
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(self.max_length)
+        self.tokenizer.enable_padding()
+        # a second copy without truncation, so that counting sees every token
+        self.counter = Tokenizer.from_file(tokenizer_path)
+
+    @staticmethod
+    def _quantize(model_path: str) -> str:
+        quantized = model_path[:-len(".onnx")] + "_int8.onnx"
+        if not os.path.exists(quantized):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            # several worker processes may quantize at once; each writes its own file and
+            # renames it into place, so nobody ever loads a half-written graph
+            tmp = f"{quantized[:-len('.onnx')]}.{os.getpid()}.tmp.onnx"
+            try:
+                quantize_dynamic(model_path, tmp, weight_type=QuantType.QInt8)
+                os.replace(tmp, quantized)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        return quantized
+
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        out = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start:start + batch_size])
+            ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": ids, "attention_mask": mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.zeros_like(ids)
+
+            hidden = self.session.run(None, feeds)[0]
+            weights = mask[:, :, None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            out.append(pooled / np.clip(norms, 1e-12, None))
+        return np.vstack(out).astype(np.float32)
+
+    def _count_tokens(self, text: str) -> int:
+        return len(self.counter.encode(text, add_special_tokens=False).ids)
+
+
+class HashingBackend(EmbeddingBackend):
+    """
+    Signed feature hashing of lower-cased unigrams and bigrams with sublinear term
+    frequency, L2-normalized. No model, no state, identical output on every machine.
+    """
+
+    def __init__(self, dim: int = 384):
+        super().__init__()
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = re.findall(r"[a-z0-9']+", text.lower())
+            counts = {}
+            for feature in tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]:
+                counts[feature] = counts.get(feature, 0) + 1
+            for feature, count in counts.items():
+                h = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                out[row, h % self.dim] += sign * (1.0 + np.log(count))
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return out / norms
+
+    def _dimension(self) -> int:
+        return self.dim
+
+
+BACKENDS = {
+    "sentence-transformers": lambda model, threads: SentenceTransformerBackend(model, threads=threads),
+    "onnx": lambda model, threads: OnnxBackend(model, threads=threads),
+    "onnx-int8": lambda model, threads: OnnxBackend(model, quantize=True, threads=threads),
+    "hashing": lambda model, threads: HashingBackend(),
+}
+
+
+def create_backend(kind: Optional[str] = None, model_name: Optional[str] = None, threads: Optional[int] = None) -> EmbeddingBackend:
+    """Build a backend; arguments left as None come from EMBED_BACKEND, EMBED_MODEL and EMBED_THREADS."""
+    kind = kind or os.environ.get("EMBED_BACKEND", "sentence-transformers")
+    model_name = model_name or os.environ.get("EMBED_MODEL", DEFAULT_MODEL)
+    if threads is None and os.environ.get("EMBED_THREADS"):
+        threads = int(os.environ["EMBED_THREADS"])
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {kind!r}, expected one of {sorted(BACKENDS)}")
+    return BACKENDS[kind](model_name, threads)
+
+
+def document_breakpoints(sentences: List[str], backend: EmbeddingBackend, percentile: float = 70) -> List[int]:
+    """Breakpoint offsets chunk_sentences would produce for sentences when embedding with backend."""
+    from semantic_chunk import combine_sentences, calculate_cosine_distances, calculate_threshold
+
+    if len(sentences) < 2:
+        return []
+    distances = calculate_cosine_distances(backend.encode(combine_sentences(sentences)))
+    threshold = calculate_threshold(distances, "percentile", percentile=percentile)
+    return np.flatnonzero(distances > threshold).tolist()
+
+
+def boundary_agreement(reference: Sequence[int], candidate: Sequence[int], tolerance: int = 0) -> Dict[str, float]:
+    """
+    Precision, recall and F1 of candidate breakpoints against reference ones. A candidate
+    within tolerance sentences of an unmatched reference breakpoint counts as a match.
+    """
+    unmatched = sorted(reference)
+    matched = 0
+    for b in sorted(candidate):
+        for j, r in enumerate(unmatched):
+            if abs(r - b) <= tolerance:
+                del unmatched[j]
+                matched += 1
+                break
+    precision = matched / len(candidate) if candidate else 1.0
+    recall = matched / len(reference) if reference else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1}
+
+
+def compare_backends(documents: List[str], reference: EmbeddingBackend, candidates: List[EmbeddingBackend], tolerance: int = 0) -> Dict[str, Dict[str, float]]:
+    """Boundary agreement of each candidate with reference, averaged over documents."""
+    from semantic_chunk import chunk_by_sentece
+
+    split = [chunk_by_sentece(doc) for doc in documents]
+    expected = [document_breakpoints(s, reference) for s in split]
+    results = {}
+    for backend in candidates:
+        totals = {"precision": 0.0, "recall": 0.0, "f1": 0.0}
+        for sentences, ref in zip(split, expected):
+            scores = boundary_agreement(ref, document_breakpoints(sentences, backend), tolerance)
+            for key in totals:
+                totals[key] += scores[key]
+        results[backend.name] = {k: v / len(documents) for k, v in totals.items()} if documents else totals
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare chunk boundaries of embedding backends against a reference.")
+    parser.add_argument("files", nargs="+", help="text documents to chunk")
+    parser.add_argument("--reference", default="sentence-transformers")
+    parser.add_argument("--candidates", nargs="+", default=["onnx", "onnx-int8", "hashing"])
+    parser.add_argument("--tolerance", type=int, default=0, help="sentences a boundary may move and still match")
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    docs = []
+    for path in args.files:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            docs.append(f.read())
+    ref = create_backend(args.reference, threads=args.threads)
+    others = [create_backend(name, threads=args.threads) for name in args.candidates]
+    print(json.dumps(compare_backends(docs, ref, others, args.tolerance), indent=2))
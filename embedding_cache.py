@@ -0,0 +1,158 @@
+"""
+Content-addressed cache for sentence window embeddings.
+
+Windows are keyed by a hash of the model name and the window text, so revised drafts and
+corpora with shared boilerplate only send unseen windows to the model. There is an
+in-memory LRU tier bounded by a byte budget and an optional SQLite tier on disk.
+"""
+
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from collections import OrderedDict
+import hashlib
+import os
+import sqlite3
+import threading
+import numpy as np
+import after_fork
+
+
+# rough per-entry overhead of the key, OrderedDict node and ndarray header
+_ENTRY_OVERHEAD = 200
+
+
+
+class EmbeddingCache:
+    def __init__(self, model_name: str, max_bytes: int = 256 * 1024 * 1024, path: Optional[str] = None):
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.path = path
+
+        self._lru = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        after_fork.register(self)
+
+    def _after_fork(self):
+        # SQLite connections must not be shared across fork; the child opens its own
+        self._lock = threading.Lock()
+        self._db = None
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}\x00{text}".encode("utf-8")).digest()
+
+    def get_many(self, keys: Sequence[bytes]) -> Tuple[List[Optional[np.ndarray]], List[int]]:
+        """Look up keys; returns the cached rows (None for misses) and the indices of the misses."""
+        found = [None] * len(keys)
+        missing = []
+        with self._lock:
+            for i, k in enumerate(keys):
+                vec = self._lru.get(k)
+                if vec is not None:
+                    self._lru.move_to_end(k)
+                    self.memory_hits += 1
+                    found[i] = vec
+                else:
+                    missing.append(i)
+
+            if missing and self.path:
+                disk = self._disk_get([keys[i] for i in missing])
+                still_missing = []
+                for i in missing:
+                    vec = disk.get(keys[i])
+                    if vec is None:
+                        still_missing.append(i)
+                        continue
+                    self.disk_hits += 1
+                    found[i] = vec
+                    self._remember(keys[i], vec)
+                missing = still_missing
+
+            self.misses += len(missing)
+        return found, missing
+
+    def put_many(self, keys: Sequence[bytes], vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            for k, vec in zip(keys, vectors):
+                self._remember(k, vec.copy())
+            if self.path:
+                self._disk_put(keys, vectors)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "model": self.model_name,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "entries": len(self._lru),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "disk_path": self.path,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            self._bytes = 0
+
+    def _remember(self, key: bytes, vec: np.ndarray):
+        if key in self._lru:
+            self._lru.move_to_end(key)
+            return
+        size = vec.nbytes + len(key) + _ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        self._lru[key] = vec
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            old_key, old_vec = self._lru.popitem(last=False)
+            self._bytes -= old_vec.nbytes + len(old_key) + _ENTRY_OVERHEAD
+            self.evictions += 1
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, dim INTEGER, vec BLOB)")
+        return self._db
+
+    def _disk_get(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        db = self._connect()
+        out = {}
+        # stay well under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            part = keys[start:start + 500]
+            rows = db.execute(
+                f"SELECT key, dim, vec FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+            ).fetchall()
+            for key, dim, blob in rows:
+                out[bytes(key)] = np.frombuffer(blob, dtype=np.float32, count=dim)
+        return out
+
+    def _disk_put(self, keys: Sequence[bytes], vectors: np.ndarray):
+        db = self._connect()
+        with db:
+            db.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, dim, vec) VALUES (?, ?, ?)",
+                [(k, int(v.shape[0]), v.tobytes()) for k, v in zip(keys, vectors)],
+            )
+
+
+def cache_from_env(model_name: str) -> EmbeddingCache:
+    """Build a cache configured by EMBED_CACHE_MAX_BYTES and EMBED_CACHE_PATH (unset disables the disk tier)."""
+    return EmbeddingCache(
+        model_name,
+        max_bytes=int(os.environ.get("EMBED_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+        path=os.environ.get("EMBED_CACHE_PATH") or None,
+    )
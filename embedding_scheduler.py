@@ -0,0 +1,191 @@
+"""
+Shared micro-batching scheduler for sentence window embeddings.
+
+Every call to /process used to run its own small model.encode. The scheduler keeps one
+background worker per process that drains a queue of pending requests, packs the
+windows of requests that arrive close together into a single encode call, and hands
+each request back its own rows.
+"""
+
+
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import concurrent.futures
+import os
+import queue
+import threading
+import time
+import numpy as np
+import after_fork
+
+
+
+class _Job:
+    __slots__ = ("texts", "future", "enqueued")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.future = concurrent.futures.Future()
+        self.enqueued = time.perf_counter()
+
+
+class EmbeddingScheduler:
+    """
+    Collects embedding requests from many callers and encodes them in shared batches.
+
+    A batch is closed when it holds max_batch_size windows or when max_wait_ms has passed
+    since its first request arrived, whichever comes first. A single request larger than
+    max_batch_size is encoded on its own and is never split across batches.
+    """
+
+    def __init__(self, encode_fn: Callable[[List[str]], np.ndarray], max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self._carry = None
+
+        self._batches = 0
+        self._requests = 0
+        self._rows = 0
+        self._fill_total = 0.0
+        self._last_fill = 0.0
+        self._wait_total = 0.0
+        self._encode_total = 0.0
+
+        after_fork.register(self)
+
+    def _after_fork(self):
+        # the worker thread does not exist in a forked child; start over with an empty queue
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self._carry = None
+
+    def submit(self, texts: List[str]) -> concurrent.futures.Future:
+        """Queue texts for encoding; the future resolves to an (len(texts), dim) array."""
+        job = _Job(list(texts))
+        if not job.texts:
+            job.future.set_result(np.zeros((0, 0), dtype=np.float32))
+            return job.future
+        self._ensure_worker()
+        self._queue.put(job)
+        return job.future
+
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        """Async entry point: awaits the shared batch without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def encode_sync(self, texts: List[str]) -> np.ndarray:
+        return self.submit(texts).result()
+
+    def metrics(self) -> Dict[str, Any]:
+        batches = self._batches
+        return {
+            "queue_depth": self._queue.qsize() + (1 if self._carry is not None else 0),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": batches,
+            "requests": self._requests,
+            "rows": self._rows,
+            "last_batch_fill_ratio": self._last_fill,
+            "mean_batch_fill_ratio": self._fill_total / batches if batches else 0.0,
+            "mean_rows_per_batch": self._rows / batches if batches else 0.0,
+            "mean_queue_wait_ms": 1000.0 * self._wait_total / self._requests if self._requests else 0.0,
+            "mean_encode_ms": 1000.0 * self._encode_total / batches if batches else 0.0,
+        }
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="embedding-scheduler", daemon=True)
+                self._worker.start()
+
+    def _next_job(self, timeout: Optional[float]) -> Optional[_Job]:
+        """The next job that was not cancelled, or None once timeout has passed."""
+        if self._carry is not None:
+            job, self._carry = self._carry, None
+            return job
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            try:
+                remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                return None
+            # a caller that gave up (e.g. asyncio.wait_for timed out) has cancelled its
+            # future; a claimed future can no longer be cancelled while it is encoded
+            if job.future.set_running_or_notify_cancel():
+                return job
+
+    def _collect(self) -> List[_Job]:
+        first = self._next_job(None)
+        batch = [first]
+        size = len(first.texts)
+        deadline = time.perf_counter() + self.max_wait
+
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            job = self._next_job(remaining)
+            if job is None:
+                break
+            if size + len(job.texts) > self.max_batch_size:
+                # keep whole requests together; this one opens the next batch
+                self._carry = job
+                break
+            batch.append(job)
+            size += len(job.texts)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                batch = self._collect()
+                self._encode_batch(batch)
+            except Exception as e:
+                # never leave a caller waiting on a future that nobody will resolve
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+
+    def _encode_batch(self, batch: List[_Job]):
+        texts = [t for job in batch for t in job.texts]
+
+        start = time.perf_counter()
+        embeddings = np.asarray(self.encode_fn(texts))
+        end = time.perf_counter()
+
+        offset = 0
+        for job in batch:
+            n = len(job.texts)
+            if not job.future.done():
+                job.future.set_result(embeddings[offset:offset + n])
+            offset += n
+            self._wait_total += start - job.enqueued
+
+        fill = min(1.0, len(texts) / self.max_batch_size)
+        self._batches += 1
+        self._requests += len(batch)
+        self._rows += len(texts)
+        self._fill_total += fill
+        self._last_fill = fill
+        self._encode_total += end - start
+
+
+def scheduler_from_env(encode_fn: Callable[[List[str]], np.ndarray]) -> EmbeddingScheduler:
+    """Build a scheduler configured by EMBED_MAX_BATCH_SIZE and EMBED_MAX_WAIT_MS."""
+    return EmbeddingScheduler(
+        encode_fn,
+        max_batch_size=int(os.environ.get("EMBED_MAX_BATCH_SIZE", 64)),
+        max_wait_ms=float(os.environ.get("EMBED_MAX_WAIT_MS", 5.0)),
+    )
@@ -0,0 +1,25 @@
+# gunicorn -c gunicorn.conf.py app:app
+#
+# The app is imported once in the master, which loads the model weights before forking;
+# workers share those pages copy-on-write instead of each holding a private copy. Inference
+# threads do not survive fork, so every worker runs its warm-up after being forked and
+# reports readiness on GET /ready.
+#
+# Each worker serves requests from a pool of threads (the gthread worker), so concurrent
+# requests in one process reach its embedding scheduler together and share encode batches.
+
+import os
+
+os.environ.setdefault("CHUNKER_WARMUP", "post_fork")
+# document sessions must be reachable from every worker, so they are kept in a shared file
+os.environ.setdefault("SESSIONS_PATH", "sessions.sqlite3")
+
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("WORKER_THREADS", 8))
+preload_app = True
+
+
+def post_fork(server, worker):
+    from semantic_chunk import start_warm_up
+    start_warm_up()
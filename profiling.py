@@ -0,0 +1,99 @@
+"""
+Per-stage timers and counters for the chunking pipeline.
+
+PipelineStats collects one run: seconds per stage (tokenize, windows, embed, distances,
+breakpoints, assemble) and counters such as sentences, windows and tokens. StageMetrics
+aggregates many runs for the /metrics endpoint and keeps a bounded window of recent
+latencies for percentiles.
+"""
+
+
+from typing import Any, Dict, Optional
+from collections import deque
+from contextlib import contextmanager
+import sys
+import threading
+import time
+import numpy as np
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process, or None where the resource module is missing."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PipelineStats:
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        self.started = time.perf_counter()
+        self.total = None
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "total_ms": 1000.0 * (self.total if self.total is not None else time.perf_counter() - self.started),
+            "stages_ms": {name: 1000.0 * seconds for name, seconds in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+
+
+class StageMetrics:
+    """Thread-safe aggregate of PipelineStats across requests."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._runs = 0
+        self._totals = {}
+        self._counters = {}
+        self._recent = {}
+        self._window = window
+
+    def record(self, stats: PipelineStats):
+        with self._lock:
+            self._runs += 1
+            timings = dict(stats.stages)
+            if stats.total is not None:
+                timings["total"] = stats.total
+            for name, seconds in timings.items():
+                self._totals[name] = self._totals.get(name, 0.0) + seconds
+                self._recent.setdefault(name, deque(maxlen=self._window)).append(seconds)
+            for name, n in stats.counters.items():
+                self._counters[name] = self._counters.get(name, 0) + n
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {}
+            for name, recent in self._recent.items():
+                p50, p95, p99 = np.percentile(list(recent), [50, 95, 99]) * 1000.0
+                stages[name] = {
+                    "total_ms": 1000.0 * self._totals[name],
+                    "p50_ms": p50,
+                    "p95_ms": p95,
+                    "p99_ms": p99,
+                }
+            return {
+                "runs": self._runs,
+                "stages": stages,
+                "counters": dict(self._counters),
+                "peak_rss_bytes": peak_rss_bytes(),
+            }
@@ -0,0 +1,257 @@
+"""
+Streaming semantic chunker for documents that do not fit in memory.
+
+Text is read in blocks, split into sentences and embedded in bounded batches. Only the
+sentences of the chunk being built, the buffer_size overlap needed for the next windows
+and the previous window embedding are kept. The global percentile used by process_text
+cannot be computed on a stream, so the threshold comes from a P² quantile sketch once a
+warm-up sample has been seen; documents shorter than the warm-up use the exact percentile
+and chunk the same way as process_text.
+"""
+
+
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Union
+import asyncio
+import io
+import os
+import re
+import numpy as np
+from semantic_chunk import (
+    preprocess_text,
+    combine_sentences,
+    get_embeddings,
+    calculate_cosine_distances,
+)
+
+Source = Union[str, os.PathLike, io.TextIOBase, Iterable[str]]
+
+_LAST_SPACE = re.compile(r"\s+\S*$")
+
+
+class P2Quantile:
+    """
+    P² estimator (Jain & Chlamtac, 1985) for a single quantile in O(1) memory.
+    q is a fraction, e.g. 0.7 for the 70th percentile.
+    """
+
+    def __init__(self, q: float):
+        if not 0 < q < 1:
+            raise ValueError("q must be between 0 and 1")
+        self.q = q
+        self.count = 0
+        self._initial = []
+        self._heights = None
+        self._pos = None
+        self._want = None
+        self._inc = None
+
+    def add(self, x: float):
+        x = float(x)
+        self.count += 1
+        if self._heights is None:
+            self._initial.append(x)
+            if len(self._initial) == 5:
+                q = self.q
+                self._heights = sorted(self._initial)
+                self._pos = [1, 2, 3, 4, 5]
+                self._want = [1, 1 + 2 * q, 1 + 4 * q, 3 + 2 * q, 5]
+                self._inc = [0, q / 2, q, (1 + q) / 2, 1]
+            return
+
+        h, pos = self._heights, self._pos
+        if x < h[0]:
+            h[0] = x
+            k = 0
+        elif x >= h[4]:
+            h[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(1, 5) if x < h[i]) - 1
+
+        for i in range(k + 1, 5):
+            pos[i] += 1
+        for i in range(5):
+            self._want[i] += self._inc[i]
+
+        for i in range(1, 4):
+            d = self._want[i] - pos[i]
+            if (d >= 1 and pos[i + 1] - pos[i] > 1) or (d <= -1 and pos[i - 1] - pos[i] < -1):
+                d = 1 if d > 0 else -1
+                candidate = self._parabolic(i, d)
+                if not h[i - 1] < candidate < h[i + 1]:
+                    candidate = h[i] + d * (h[i + d] - h[i]) / (pos[i + d] - pos[i])
+                h[i] = candidate
+                pos[i] += d
+
+    def _parabolic(self, i: int, d: int) -> float:
+        h, n = self._heights, self._pos
+        return h[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self) -> float:
+        if self._heights is None:
+            if not self._initial:
+                raise ValueError("no observations")
+            return float(np.percentile(self._initial, self.q * 100))
+        return self._heights[2]
+
+
+def read_blocks(source: Source, block_size: int = 1 << 16) -> Iterator[str]:
+    """Yield text blocks from a file path, a text stream or an iterable of strings."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, encoding="utf-8", errors="replace") as f:
+            yield from read_blocks(f, block_size)
+    elif hasattr(source, "read"):
+        while True:
+            block = source.read(block_size)
+            if not block:
+                break
+            yield block
+    else:
+        yield from source
+
+
+def _split_complete(buffer: str, final: bool, max_carry: int):
+    """
+    Split buffer into finished sentences and the raw text of a possibly unfinished last one.
+    An unfinished tail longer than max_carry characters (unpunctuated text such as ASR
+    transcripts) is cut at its last whitespace before the limit, so the carry stays bounded
+    and the same text is not re-tokenized block after block.
+    """
+    import nltk
+
+    raw = nltk.sent_tokenize(buffer)
+    if final:
+        return raw, ""
+    if len(raw) < 2:
+        raw, tail = [], buffer
+    else:
+        # punkt returns slices of the input, so the tail can be recovered verbatim
+        tail = buffer[buffer.rfind(raw[-1]):]
+        raw = raw[:-1]
+
+    while len(tail) > max_carry:
+        match = _LAST_SPACE.search(tail, 0, max_carry)
+        cut = match.start() if match and match.start() > 0 else max_carry
+        if tail[:cut].strip():
+            raw.append(tail[:cut])
+        tail = tail[cut:].lstrip()
+    return raw, tail
+
+
+async def aiter_chunks(
+    source: Source,
+    percentile: float = 70,
+    buffer_size: int = 1,
+    batch_sentences: int = 256,
+    warmup: int = 256,
+    block_size: int = 1 << 16,
+    max_carry: int = 1 << 16,
+) -> AsyncIterator[str]:
+    """
+    Yield chunks of source as soon as their boundaries are decided.
+
+    batch_sentences bounds how many windows are embedded at once, warmup is the number of
+    distances collected before the P² estimate replaces the exact percentile. A sentence
+    still unfinished after max_carry characters is cut at a word boundary.
+    """
+    estimator = P2Quantile(percentile / 100)
+
+    sentences = []  # sentences[k] is sentence number base + k
+    base = 0
+    total = 0  # number of sentences read so far
+    windows_built = 0
+    prev_embedding = None
+    chunk_start = 0
+    pending = []  # distances waiting for the warm-up sample, as (index, distance)
+    distance_index = 0
+
+    def decide(idx: int, dist: float, threshold: float) -> Optional[str]:
+        nonlocal chunk_start
+        # like process_text, distance idx above threshold starts a new chunk at sentence idx
+        if dist > threshold:
+            chunk = ' '.join(sentences[chunk_start - base:idx - base])
+            chunk_start = idx
+            return chunk
+        return None
+
+    async def embed(final: bool) -> List[str]:
+        nonlocal windows_built, prev_embedding, distance_index, pending
+        ready = total if final else total - buffer_size
+        if ready - windows_built < (1 if final else batch_sentences):
+            return []
+        out = []
+        while windows_built < ready:
+            stop = min(ready, windows_built + batch_sentences)
+            lo = max(windows_built - buffer_size, base)
+            hi = min(stop + buffer_size, total)
+            local = combine_sentences(sentences[lo - base:hi - base], buffer_size)
+            windows = local[windows_built - lo:stop - lo]
+            embeddings = await get_embeddings(windows)
+            if prev_embedding is not None:
+                embeddings = np.vstack([prev_embedding[None, :], embeddings])
+            distances = calculate_cosine_distances(embeddings)
+            prev_embedding = embeddings[-1]
+            windows_built = stop
+
+            for dist in distances:
+                estimator.add(dist)
+                pending.append((distance_index, float(dist)))
+                distance_index += 1
+                if estimator.count < warmup:
+                    continue
+                threshold = estimator.value()
+                for idx, d in pending:
+                    chunk = decide(idx, d, threshold)
+                    if chunk is not None:
+                        out.append(chunk)
+                pending = []
+        return out
+
+    carry = ""
+    blocks = read_blocks(source, block_size)
+    finished = False
+    while not finished:
+        block = next(blocks, None)
+        finished = block is None
+        raw, carry = _split_complete(carry + (block or ""), finished, max_carry)
+        if raw:
+            sentences.extend(preprocess_text(s) for s in raw)
+            total += len(raw)
+
+        for chunk in await embed(finished):
+            yield chunk
+
+        # drop sentences that are neither in the open chunk nor needed for upcoming windows
+        keep_from = min(chunk_start, max(windows_built - buffer_size, 0))
+        if keep_from > base:
+            del sentences[:keep_from - base]
+            base = keep_from
+
+    if total == 0:
+        return
+    if pending:
+        # the whole document fit in the warm-up sample: use the exact percentile
+        threshold = np.percentile([d for _, d in pending], percentile)
+        for idx, d in pending:
+            chunk = decide(idx, d, threshold)
+            if chunk is not None:
+                yield chunk
+    yield ' '.join(sentences[chunk_start - base:])
+
+
+def iter_chunks(source: Source, **kwargs) -> Iterator[str]:
+    """Synchronous wrapper around aiter_chunks, for WSGI responses and scripts."""
+    loop = asyncio.new_event_loop()
+    agen = aiter_chunks(source, **kwargs)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(agen.aclose())
+        loop.close()
@@ -0,0 +1,58 @@
+import asyncio
+import io
+import json
+import nltk
+import pytest
+
+
+def _have_punkt():
+    try:
+        nltk.sent_tokenize("One. Two.")
+    except LookupError:
+        return False
+    return True
+
+
+pytestmark = pytest.mark.skipif(not _have_punkt(), reason="nltk punkt data is not installed")
+
+TOPICS = ["otters float in the kelp", "the court hears the appeal", "the probe orbits the moon"]
+DOCUMENT = " ".join(f"Sentence {i} says that {TOPICS[i // 8 % 3]} today." for i in range(48))
+
+
+@pytest.fixture
+def client():
+    from app import app
+    return app.test_client()
+
+
+def ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_stream_file_upload(client):
+    from semantic_chunk import process_text
+
+    response = client.post(
+        "/process/stream",
+        data={"file": (io.BytesIO(DOCUMENT.encode("utf-8")), "transcript.txt")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 200
+    lines = ndjson(response)
+    chunks, summary = lines[:-1], lines[-1]
+
+    assert "error" not in summary
+    assert summary["chunks"] == len(chunks)
+    assert [c["id"] for c in chunks] == list(range(len(chunks)))
+    # a document shorter than the warm-up sample chunks exactly like process_text
+    assert [c["text"] for c in chunks] == asyncio.run(process_text(DOCUMENT))
+
+
+def test_stream_text_field(client):
+    lines = ndjson(client.post("/process/stream", data={"text": DOCUMENT}))
+    assert lines[-1]["chunks"] == len(lines) - 1
+    assert " ".join(c["text"] for c in lines[:-1]).split() == DOCUMENT.split()
+
+
+def test_stream_rejects_empty_text(client):
+    assert client.post("/process/stream", data={"text": "  "}).status_code == 400
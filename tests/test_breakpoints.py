@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+import semantic_chunk
+from semantic_chunk import (
+    calculate_threshold,
+    create_final_chunks,
+    find_breakpoints,
+    limit_chunk_tokens,
+)
+
+
+def chunk_sizes(tokens, breakpoints):
+    bounds = [0, *breakpoints, len(tokens)]
+    return [sum(tokens[bounds[i]:bounds[i + 1]]) for i in range(len(bounds) - 1)]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_limit_chunk_tokens_respects_the_bound(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(2, 200))
+    tokens = rng.integers(1, 40, n).tolist()
+    distances = rng.random(n - 1)
+    max_tokens = int(rng.integers(1, 120))
+    start = sorted(rng.choice(np.arange(1, n), size=int(rng.integers(0, n // 4 + 1)), replace=False).tolist())
+
+    breakpoints = limit_chunk_tokens(distances, tokens, start, max_tokens)
+
+    assert set(start) <= set(breakpoints)
+    assert breakpoints == sorted(set(breakpoints)) and 0 not in breakpoints
+    bounds = [0, *breakpoints, n]
+    for size, first, last in zip(chunk_sizes(tokens, breakpoints), bounds, bounds[1:]):
+        # only a single sentence may be longer than the budget
+        assert size <= max_tokens or last - first == 1
+
+
+def test_limit_chunk_tokens_cuts_at_the_largest_distances():
+    # distances[p - 1] scores a cut at offset p
+    distances = np.array([0.1, 0.9, 0.2, 0.8, 0.3])
+    assert limit_chunk_tokens(distances, [1] * 6, [], 2) == [2, 4]
+
+
+def test_limit_chunk_tokens_rejects_non_positive_budget():
+    with pytest.raises(ValueError):
+        limit_chunk_tokens(np.zeros(2), [1, 1, 1], [], 0)
+
+
+def test_max_chunk_tokens_uses_the_backend_tokenizer(monkeypatch):
+    # pretend every character is a token, so the bound must hold in characters
+    monkeypatch.setattr(semantic_chunk.backend, "count_tokens", len)
+    sentences = ["aaaa", "bb", "cccccc", "d", "eeeee", "ff"]
+    distances = np.array([0.2, 0.1, 0.4, 0.3, 0.5])
+
+    breakpoints = find_breakpoints(distances, "percentile", 100, sentences=sentences, max_chunk_tokens=7)
+
+    for chunk in create_final_chunks(sentences, breakpoints):
+        assert len(chunk.replace(" ", "")) <= 7 or " " not in chunk
+
+
+@pytest.mark.parametrize("n_chunks", [1, 2, 3, 7, 19, 20, 50])
+def test_n_chunks_returns_the_requested_number_of_chunks(n_chunks):
+    rng = np.random.default_rng(n_chunks)
+    sentences = [f"s{i}" for i in range(20)]
+    distances = rng.random(19)
+
+    chunks = create_final_chunks(sentences, find_breakpoints(distances, "n_chunks", n_chunks))
+
+    assert len(chunks) == min(n_chunks, len(sentences))
+    assert all(chunks)
+    assert " ".join(chunks).split() == sentences
+
+
+def test_n_chunks_threshold_leaves_n_minus_one_distances_above():
+    distances = np.array([0.5, 0.1, 0.9, 0.3, 0.7, 0.2])
+    for n in range(1, 8):
+        threshold = calculate_threshold(distances, "n_chunks", n_chunks=n)
+        assert (distances > threshold).sum() == min(n - 1, len(distances))
+
+
+def test_n_chunks_starts_chunks_after_the_crossing_distance():
+    breakpoints = find_breakpoints(np.array([0.9, 0.1, 0.2, 0.3]), "n_chunks", 2)
+    assert breakpoints == [1]
+    assert create_final_chunks(list("abcde"), breakpoints) == ["a", "b c d e"]
+
+
+def test_default_percentile_keeps_the_original_offsets():
+    assert find_breakpoints(np.array([0.9, 0.1, 0.2, 0.3])) == [0]
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"breakpoint_type": "percentile", "breakpoint_amount": 150},
+    {"breakpoint_type": "gradient", "breakpoint_amount": -1},
+    {"breakpoint_type": "n_chunks", "breakpoint_amount": 0},
+    {"breakpoint_type": "n_chunks", "breakpoint_amount": 2.5},
+    {"breakpoint_type": "n_chunks"},
+    {"breakpoint_type": "unknown"},
+    {"max_chunk_tokens": 0},
+])
+def test_invalid_parameters_raise_value_error(kwargs):
+    with pytest.raises(ValueError):
+        find_breakpoints(np.array([0.1, 0.2, 0.3]), sentences=["a", "b", "c", "d"], **kwargs)
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from document_session import DocumentSession, SessionConflict, SessionStore, SessionTooLarge
+
+
+def stored_version(version=1, n=6, dim=4, seed=0):
+    """A session as it looks after `version` updates, without running the model."""
+    rng = np.random.default_rng(seed)
+    session = DocumentSession()
+    session.version = version
+    session.sentences = [f"Sentence {i} of version {version}." for i in range(n)]
+    session.embeddings = rng.random((n, dim), dtype=np.float32)
+    session.distances = rng.random(n - 1, dtype=np.float32)
+    session.threshold = 0.5
+    session.breakpoints = [2, 4]
+    return session
+
+
+def test_state_round_trip():
+    session = stored_version()
+    restored = DocumentSession.from_state(*session.to_state())
+
+    assert restored.version == session.version
+    assert restored.sentences == session.sentences
+    assert restored.breakpoints == session.breakpoints
+    assert restored.chunks == [" ".join(session.sentences[a:b]) for a, b in [(0, 2), (2, 4), (4, 6)]]
+    np.testing.assert_array_equal(restored.embeddings, session.embeddings)
+    np.testing.assert_array_equal(restored.distances, session.distances)
+
+
+def test_workers_sharing_a_path_see_the_same_sessions(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    worker_a, worker_b = SessionStore(path), SessionStore(path)
+
+    session_id, _ = worker_a.create()
+    worker_a.save(session_id, stored_version())
+    loaded = worker_b.get(session_id)
+
+    assert loaded is not None and loaded.version == 1
+    loaded.version = 2
+    worker_b.save(session_id, loaded)
+    assert worker_a.get(session_id).version == 2
+    assert worker_b.delete(session_id)
+    assert worker_a.get(session_id) is None
+
+
+def test_concurrent_updates_conflict():
+    store = SessionStore()
+    session_id, _ = store.create()
+    store.save(session_id, stored_version())
+
+    first, second = store.get(session_id), store.get(session_id)
+    first.version = second.version = 2
+    store.save(session_id, first)
+    with pytest.raises(SessionConflict):
+        store.save(session_id, second)
+
+
+def test_saving_an_evicted_session_raises_key_error():
+    store = SessionStore()
+    session_id, _ = store.create()
+    store.save(session_id, stored_version())
+    store.delete(session_id)
+    with pytest.raises(KeyError):
+        store.save(session_id, stored_version(version=2))
+
+
+def test_least_recently_used_sessions_are_evicted():
+    store = SessionStore(max_sessions=2)
+    ids = []
+    for _ in range(3):
+        session_id, _ = store.create()
+        store.save(session_id, stored_version())
+        ids.append(session_id)
+        store.get(ids[0])  # keep the first one in use
+
+    assert store.get(ids[0]) is not None
+    assert store.get(ids[1]) is None
+    assert store.get(ids[2]) is not None
+
+
+def test_byte_budget():
+    size = sum(len(part) for part in stored_version().to_state())
+    store = SessionStore(max_bytes=2 * size)
+    ids = []
+    for _ in range(3):
+        session_id, _ = store.create()
+        store.save(session_id, stored_version())
+        ids.append(session_id)
+
+    assert store.stats()["bytes"] <= 2 * size
+    assert store.get(ids[0]) is None and store.get(ids[2]) is not None
+
+    session_id, _ = store.create()
+    with pytest.raises(SessionTooLarge):
+        store.save(session_id, stored_version(n=500))
+    assert store.get(session_id) is None
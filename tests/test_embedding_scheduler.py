@@ -0,0 +1,78 @@
+import asyncio
+import threading
+import numpy as np
+import pytest
+from embedding_scheduler import EmbeddingScheduler
+
+
+def encode_lengths(texts):
+    return np.array([[len(t)] for t in texts], dtype=np.float32)
+
+
+def test_requests_get_their_own_rows():
+    scheduler = EmbeddingScheduler(encode_lengths, max_batch_size=8, max_wait_ms=20)
+
+    async def main():
+        return await asyncio.gather(scheduler.encode(["a", "bb"]), scheduler.encode(["ccc"]))
+
+    first, second = asyncio.run(main())
+    assert first[:, 0].tolist() == [1, 2]
+    assert second[:, 0].tolist() == [3]
+
+
+def test_timed_out_caller_does_not_stall_its_batch():
+    release = threading.Event()
+
+    def slow_encode(texts):
+        release.wait(5)
+        return encode_lengths(texts)
+
+    scheduler = EmbeddingScheduler(slow_encode, max_batch_size=8, max_wait_ms=50)
+
+    async def main():
+        # both requests land in the same batch; the first caller gives up while it encodes
+        impatient = asyncio.ensure_future(asyncio.wait_for(scheduler.encode(["impatient"]), 0.2))
+        await asyncio.sleep(0.01)
+        patient = asyncio.ensure_future(scheduler.encode(["patient"]))
+        with pytest.raises(asyncio.TimeoutError):
+            await impatient
+        release.set()
+        return await asyncio.wait_for(patient, 5)
+
+    assert asyncio.run(main())[:, 0].tolist() == [7]
+    assert scheduler.submit(["again"]).result(5)[:, 0].tolist() == [5]
+    assert scheduler._worker.is_alive()
+
+
+def test_cancelled_request_is_not_encoded():
+    started = threading.Event()
+    release = threading.Event()
+    seen = []
+
+    def blocking_encode(texts):
+        seen.append(list(texts))
+        started.set()
+        release.wait(5)
+        return encode_lengths(texts)
+
+    scheduler = EmbeddingScheduler(blocking_encode, max_batch_size=1, max_wait_ms=0)
+    first = scheduler.submit(["first"])
+    assert started.wait(5)
+    cancelled = scheduler.submit(["cancelled"])
+    assert cancelled.cancel()
+    last = scheduler.submit(["last"])
+    release.set()
+
+    assert first.result(5)[:, 0].tolist() == [5]
+    assert last.result(5)[:, 0].tolist() == [4]
+    assert ["cancelled"] not in seen
+
+
+def test_encode_errors_reach_every_caller():
+    def failing_encode(texts):
+        raise RuntimeError("backend down")
+
+    scheduler = EmbeddingScheduler(failing_encode)
+    with pytest.raises(RuntimeError, match="backend down"):
+        scheduler.submit(["x"]).result(5)
+    assert scheduler._worker.is_alive()